@@ -0,0 +1,99 @@
+"""Micro-benchmark: CORS preflight latency, old handlers vs the cors module
+
+Usage: python bench_cors.py [iterations] [rounds]
+
+"before" rebuilds the old setup (flask_cors plus a route that answers
+OPTIONS with jsonify({}) and hand-added headers); it is skipped if
+flask_cors is not installed. "after" uses cors.init_cors.
+
+Both apps are warmed up, then measured in alternating rounds; the min and
+median per-preflight times over all rounds are reported.
+"""
+import os
+import statistics
+import timeit
+
+from flask import Flask, jsonify, request
+
+from cors import init_cors
+
+ORIGIN = 'http://localhost:5500'
+PREFLIGHT_HEADERS = {
+    'Origin': ORIGIN,
+    'Access-Control-Request-Method': 'POST',
+    'Access-Control-Request-Headers': 'Content-Type',
+}
+
+
+def make_before_app():
+    """App with the previous per-route OPTIONS handling"""
+    from flask_cors import CORS
+
+    app = Flask('before')
+    CORS(app, origins=[ORIGIN])
+
+    @app.route('/api/products', methods=['GET', 'POST', 'OPTIONS'])
+    def products_api():
+        if request.method == 'OPTIONS':
+            response = jsonify({})
+            response.headers.add('Access-Control-Allow-Origin', '*')
+            response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
+            response.headers.add('Access-Control-Allow-Methods', 'GET,PUT,POST,DELETE,OPTIONS')
+            return response
+        return jsonify([])
+
+    return app
+
+
+def make_after_app():
+    """App using the shared CORS layer"""
+    app = Flask('after')
+    init_cors(app, [ORIGIN])
+
+    @app.route('/api/products', methods=['GET', 'POST'])
+    def products_api():
+        return jsonify([])
+
+    return app
+
+
+def preflight_timer(app):
+    """Callable that sends one preflight through the test client"""
+    client = app.test_client()
+    return lambda: client.options('/api/products', headers=PREFLIGHT_HEADERS)
+
+
+def bench(apps, iterations, rounds):
+    """Per-preflight times in microseconds for each app, measured alternately"""
+    timers = {name: preflight_timer(app) for name, app in apps.items()}
+    for timer in timers.values():
+        timeit.timeit(timer, number=iterations // 10 or 1)  # warm-up
+
+    results = {name: [] for name in timers}
+    for i in range(rounds):
+        # Alternate which app goes first so drift hits both equally
+        order = list(timers) if i % 2 == 0 else list(reversed(timers))
+        for name in order:
+            seconds = timeit.repeat(timers[name], number=iterations, repeat=1)[0]
+            results[name].append(seconds / iterations * 1e6)
+    return results
+
+
+if __name__ == "__main__":
+    iterations = int(os.sys.argv[1]) if len(os.sys.argv) > 1 else 2000
+    rounds = int(os.sys.argv[2]) if len(os.sys.argv) > 2 else 10
+
+    apps = {}
+    try:
+        apps['before'] = make_before_app()
+    except ImportError:
+        print("before: skipped (flask_cors not installed)")
+    apps['after'] = make_after_app()
+
+    results = bench(apps, iterations, rounds)
+    for name, times in results.items():
+        print(f"{name + ':':8}min {min(times):.1f} us, median {statistics.median(times):.1f} us per preflight")
+    if 'before' in results:
+        before = statistics.median(results['before'])
+        after = statistics.median(results['after'])
+        print(f"speedup (median): {before / after:.2f}x")
@@ -0,0 +1,60 @@
+from typing import Dict, Iterable, Tuple
+
+from flask import Response, request
+
+ALLOWED_METHODS = 'GET,PUT,POST,DELETE,OPTIONS'
+ALLOWED_HEADERS = 'Content-Type,Authorization'
+# Brauzer preflight javobini qancha saqlaydi (sekund)
+PREFLIGHT_MAX_AGE = 86400
+
+HeaderTuple = Tuple[Tuple[str, str], ...]
+
+
+def build_header_sets(origins: Iterable[str],
+                      max_age: int = PREFLIGHT_MAX_AGE) -> Tuple[Dict[str, HeaderTuple], Dict[str, HeaderTuple]]:
+    """Precompute (preflight, response) CORS header tuples for each allowed origin"""
+    preflight = {}
+    response = {}
+    for origin in origins:
+        response[origin] = (
+            ('Access-Control-Allow-Origin', origin),
+            ('Vary', 'Origin'),
+        )
+        preflight[origin] = response[origin] + (
+            ('Access-Control-Allow-Methods', ALLOWED_METHODS),
+            ('Access-Control-Allow-Headers', ALLOWED_HEADERS),
+            ('Access-Control-Max-Age', str(max_age)),
+        )
+    return preflight, response
+
+
+class PreflightResponse(Response):
+    """Empty response without a default Content-Type"""
+    default_mimetype = None
+
+
+def init_cors(app, origins: Iterable[str], max_age: int = PREFLIGHT_MAX_AGE):
+    """Answer CORS preflights and add CORS headers for the allowed origins
+
+    Preflights are answered with an empty 204 before routing, so no view
+    runs and nothing is JSON encoded.
+    """
+    preflight_headers, response_headers = build_header_sets(origins, max_age)
+    # Other origins (or none) still vary by Origin, so shared caches keep them apart
+    vary_only = (('Vary', 'Origin'),)
+
+    def is_preflight():
+        return request.method == 'OPTIONS' and 'Access-Control-Request-Method' in request.headers
+
+    @app.before_request
+    def _cors_preflight():
+        if not is_preflight():
+            return None
+        origin = request.headers.get('Origin', '')
+        return PreflightResponse(status=204, headers=preflight_headers.get(origin, vary_only))
+
+    @app.after_request
+    def _cors_headers(response):
+        if not is_preflight():
+            response.headers.extend(response_headers.get(request.headers.get('Origin', ''), vary_only))
+        return response
@@ -1,17 +1,46 @@
 import sqlite3
 import json
-from datetime import datetime
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
 from typing import List, Dict, Optional
 
+import spatial
+from profiling import TracedConnection, init_profiling
+
+# Idempotency kalitlari qancha vaqt saqlanadi (sekund)
+IDEMPOTENCY_TTL = 24 * 60 * 60
+# Xotiradagi LRU keshning maksimal hajmi
+IDEMPOTENCY_CACHE_SIZE = 4096
+# Murojaatlar sahifasining maksimal hajmi
+CONTACT_PAGE_MAX = 200
+# Bitta UPDATE ... IN (...) so'rovidagi id'lar soni (SQLite parametr limiti)
+CONTACT_BATCH_SIZE = 500
+# admin_settings kalitlari: filiallar joylashuvi va yetkazib berish zonalari (JSON)
+BRANCH_LOCATIONS_SETTING = 'branch_locations'
+DELIVERY_ZONES_SETTING = 'delivery_zones'
+# Oxirgi tekshirilgan buyurtma id'si (joylashuvlarni to'ldirish uchun)
+LOCATIONS_BACKFILLED_SETTING = 'order_locations_backfilled_id'
+
 class Database:
     def __init__(self, db_path: str = "popays.db"):
         self.db_path = db_path
+        # Recently seen idempotency keys: key -> (order row id, order_id, created at on the monotonic clock)
+        self._idempotency_cache = OrderedDict()
+        self._idempotency_lock = threading.Lock()
         # Database'ni avtomatik yaratish
         self.init_db()
+        # Index locations of orders saved before the lat/lon columns existed
+        self.backfill_order_locations()
+
+    def connect(self) -> sqlite3.Connection:
+        """Open a connection (statements are timed when profiling is enabled)"""
+        return sqlite3.connect(self.db_path, factory=TracedConnection)
 
     def init_db(self):
         """Initialize database and create tables"""
-        with sqlite3.connect(self.db_path) as db:
+        with self.connect() as db:
             # Products table
             db.execute("""
                 CREATE TABLE IF NOT EXISTS products (
@@ -44,6 +73,29 @@ class Database:
                 )
             """)
 
+            # Spatial index over order locations (one point per order)
+            db.execute("""
+                CREATE VIRTUAL TABLE IF NOT EXISTS orders_rtree USING rtree (
+                    id,
+                    min_lat, max_lat,
+                    min_lon, max_lon
+                )
+            """)
+
+            # Idempotency keys for order submission (client retries)
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS order_idempotency_keys (
+                    idempotency_key TEXT PRIMARY KEY,
+                    order_row_id INTEGER NOT NULL,
+                    order_id TEXT NOT NULL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            db.execute("""
+                CREATE INDEX IF NOT EXISTS idx_order_idempotency_created
+                ON order_idempotency_keys (created_at)
+            """)
+
             # Contact messages table
             db.execute("""
                 CREATE TABLE IF NOT EXISTS contact_messages (
@@ -58,6 +110,31 @@ class Database:
                 )
             """)
 
+            # Inbox indexes for keyset paging (newest first)
+            db.execute("""
+                CREATE INDEX IF NOT EXISTS idx_contact_messages_status_created
+                ON contact_messages (status, created_at, id)
+            """)
+            db.execute("""
+                CREATE INDEX IF NOT EXISTS idx_contact_messages_created
+                ON contact_messages (created_at, id)
+            """)
+
+            # Archived contact messages (moved out of the hot table)
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS contact_messages_archive (
+                    id INTEGER PRIMARY KEY,
+                    customer_name TEXT NOT NULL,
+                    customer_phone TEXT NOT NULL,
+                    customer_email TEXT,
+                    message TEXT NOT NULL,
+                    status TEXT,
+                    created_at TIMESTAMP,
+                    updated_at TIMESTAMP,
+                    archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+
             # Categories table
             db.execute("""
                 CREATE TABLE IF NOT EXISTS categories (
@@ -95,11 +172,19 @@ class Database:
                 # Column already exists, ignore error
                 pass
             
+            # Add latitude/longitude columns if they don't exist (for existing databases)
+            for column in ("latitude", "longitude"):
+                try:
+                    db.execute(f"ALTER TABLE orders ADD COLUMN {column} REAL")
+                except sqlite3.OperationalError:
+                    # Column already exists, ignore error
+                    pass
+            
             db.commit()
 
     def add_product(self, product_data: Dict) -> int:
         """Add a new product"""
-        with sqlite3.connect(self.db_path) as db:
+        with self.connect() as db:
             cursor = db.execute("""
                 INSERT INTO products (name, price, category, stock, description, img)
                 VALUES (?, ?, ?, ?, ?, ?)
@@ -116,7 +201,7 @@ class Database:
 
     def get_products(self) -> List[Dict]:
         """Get all products"""
-        with sqlite3.connect(self.db_path) as db:
+        with self.connect() as db:
             cursor = db.execute("""
                 SELECT * FROM products ORDER BY id
             """)
@@ -131,15 +216,90 @@ class Database:
             
             return products
 
+    def _cached_order_for_key(self, key: str) -> Optional[tuple]:
+        """Return the cached (row id, order_id) for an idempotency key, if still fresh"""
+        with self._idempotency_lock:
+            entry = self._idempotency_cache.get(key)
+            if entry is None:
+                return None
+            row_id, order_id, created_at = entry
+            if time.monotonic() - created_at > IDEMPOTENCY_TTL:
+                del self._idempotency_cache[key]
+                return None
+            self._idempotency_cache.move_to_end(key)
+            return row_id, order_id
+
+    def _remember_idempotency_key(self, key: str, row_id: int, order_id: str, age: float = 0.0):
+        """Store an idempotency key in the in-memory LRU cache
+
+        age is how many seconds ago the key was created, so the cached entry
+        expires together with the database row.
+        """
+        with self._idempotency_lock:
+            self._idempotency_cache[key] = (row_id, order_id, time.monotonic() - age)
+            self._idempotency_cache.move_to_end(key)
+            while len(self._idempotency_cache) > IDEMPOTENCY_CACHE_SIZE:
+                self._idempotency_cache.popitem(last=False)
+
+    def _lookup_idempotency_key(self, db: sqlite3.Connection, key: str,
+                                live_only: bool = True) -> Optional[tuple]:
+        """Find an idempotency key in the database and cache it
+
+        Returns (row id, order_id) or None.
+        """
+        query = """
+            SELECT order_row_id, order_id,
+                   (julianday('now') - julianday(created_at)) * 86400 AS age
+            FROM order_idempotency_keys
+            WHERE idempotency_key = ?
+        """
+        params = [key]
+        if live_only:
+            query += " AND created_at >= datetime('now', ?)"
+            params.append(f"-{IDEMPOTENCY_TTL} seconds")
+        row = db.execute(query, params).fetchone()
+        if not row:
+            return None
+        row_id, order_id, age = row
+        self._remember_idempotency_key(key, row_id, order_id, max(age, 0.0))
+        return row_id, order_id
+
+    def get_order_id_for_key(self, key: str) -> Optional[str]:
+        """Get the order_id (UUID) of the order created with an idempotency key"""
+        cached = self._cached_order_for_key(key)
+        if cached is not None:
+            return cached[1]
+        with self.connect() as db:
+            found = self._lookup_idempotency_key(db, key)
+        return found[1] if found else None
+
     def add_order(self, order_data: Dict) -> int:
-        """Add a new order"""
-        with sqlite3.connect(self.db_path) as db:
+        """Add a new order
+
+        If order_data has an 'idempotency_key', a retried submission with the
+        same key returns the original order's id instead of inserting again.
+        Use get_order_id_for_key() to get the original order_id (UUID).
+        """
+        key = order_data.get('idempotency_key')
+        if key:
+            cached = self._cached_order_for_key(key)
+            if cached is not None:
+                return cached[0]
+
+        with self.connect() as db:
+            if key:
+                found = self._lookup_idempotency_key(db, key)
+                if found:
+                    return found[0]
+
             import uuid
             order_id = str(uuid.uuid4())
+            location = spatial.parse_coordinates(order_data.get('coordinates'))
+            latitude, longitude = location if location else (None, None)
             
             cursor = db.execute("""
-                INSERT INTO orders (order_id, branch, customer_name, customer_phone, customer_location, items, total, coordinates)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                INSERT INTO orders (order_id, branch, customer_name, customer_phone, customer_location, items, total, coordinates, latitude, longitude)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
             """, (
                 order_id,
                 order_data['branch'],
@@ -148,14 +308,57 @@ class Database:
                 order_data['customer_location'],
                 json.dumps(order_data['items']),
                 order_data['total'],
-                json.dumps(order_data.get('coordinates', {}))
+                json.dumps(order_data.get('coordinates', {})),
+                latitude,
+                longitude
             ))
+            row_id = cursor.lastrowid
+
+            if location:
+                db.execute("""
+                    INSERT INTO orders_rtree (id, min_lat, max_lat, min_lon, max_lon)
+                    VALUES (?, ?, ?, ?, ?)
+                """, (row_id, latitude, latitude, longitude, longitude))
+
+            if key:
+                try:
+                    # Replace an expired key, but never a live one
+                    db.execute("""
+                        DELETE FROM order_idempotency_keys
+                        WHERE idempotency_key = ? AND created_at < datetime('now', ?)
+                    """, (key, f"-{IDEMPOTENCY_TTL} seconds"))
+                    db.execute("""
+                        INSERT INTO order_idempotency_keys (idempotency_key, order_row_id, order_id)
+                        VALUES (?, ?, ?)
+                    """, (key, row_id, order_id))
+                except sqlite3.IntegrityError:
+                    # A concurrent retry won the race - drop our duplicate order
+                    db.rollback()
+                    return self._lookup_idempotency_key(db, key, live_only=False)[0]
+
             db.commit()
-            return cursor.lastrowid
+
+        if key:
+            self._remember_idempotency_key(key, row_id, order_id)
+        return row_id
+
+    def prune_idempotency_keys(self, max_age: int = IDEMPOTENCY_TTL) -> int:
+        """Delete idempotency keys older than max_age seconds"""
+        with self.connect() as db:
+            cursor = db.execute("""
+                DELETE FROM order_idempotency_keys WHERE created_at < datetime('now', ?)
+            """, (f"-{max_age} seconds",))
+            db.commit()
+
+        now = time.monotonic()
+        with self._idempotency_lock:
+            for key in [k for k, (_, _, created_at) in self._idempotency_cache.items() if now - created_at > max_age]:
+                del self._idempotency_cache[key]
+        return cursor.rowcount
 
     def get_orders(self, status: Optional[str] = None) -> List[Dict]:
         """Get orders by status"""
-        with sqlite3.connect(self.db_path) as db:
+        with self.connect() as db:
             if status:
                 cursor = db.execute("""
                     SELECT * FROM orders WHERE status = ? ORDER BY created_at DESC
@@ -177,9 +380,118 @@ class Database:
             
             return orders
 
+    def backfill_order_locations(self) -> int:
+        """Decode coordinates of older orders into latitude/longitude and the spatial index
+
+        Only orders after the last checked id are scanned, so rows whose
+        coordinates can't be parsed are not rescanned on every run.
+        """
+        last_id = int(self.get_admin_setting(LOCATIONS_BACKFILLED_SETTING) or 0)
+        with self.connect() as db:
+            max_id = db.execute("SELECT MAX(id) FROM orders").fetchone()[0]
+            if not max_id or max_id <= last_id:
+                return 0
+
+            rows = db.execute("""
+                SELECT id, coordinates FROM orders
+                WHERE id > ? AND id <= ? AND latitude IS NULL
+                  AND coordinates IS NOT NULL AND coordinates NOT IN ('', '{}', 'null')
+            """, (last_id, max_id)).fetchall()
+            
+            updated = 0
+            for row_id, coordinates in rows:
+                location = spatial.parse_coordinates(coordinates)
+                if not location:
+                    continue
+                latitude, longitude = location
+                db.execute("""
+                    UPDATE orders SET latitude = ?, longitude = ? WHERE id = ?
+                """, (latitude, longitude, row_id))
+                db.execute("""
+                    INSERT OR REPLACE INTO orders_rtree (id, min_lat, max_lat, min_lon, max_lon)
+                    VALUES (?, ?, ?, ?, ?)
+                """, (row_id, latitude, latitude, longitude, longitude))
+                updated += 1
+
+            db.execute("""
+                INSERT OR REPLACE INTO admin_settings (key, value, updated_at)
+                VALUES (?, ?, CURRENT_TIMESTAMP)
+            """, (LOCATIONS_BACKFILLED_SETTING, str(max_id)))
+            db.commit()
+            return updated
+
+    def get_branch_locations(self) -> Optional[Dict]:
+        """Get configured branch locations, or None if not configured
+
+        Stored in admin_settings as JSON:
+        {"kosmonavt": {"name": "Kosmonavt", "latitude": ..., "longitude": ...}, ...}
+        """
+        value = self.get_admin_setting(BRANCH_LOCATIONS_SETTING)
+        if not value:
+            return None
+        try:
+            branches = json.loads(value)
+        except ValueError:
+            return None
+        return branches or None
+
+    def get_delivery_zones(self) -> List[Dict]:
+        """Get configured delivery zones: [{"name": ..., "max_km": ...}, ...]"""
+        value = self.get_admin_setting(DELIVERY_ZONES_SETTING)
+        if not value:
+            return []
+        try:
+            return json.loads(value)
+        except ValueError:
+            return []
+
+    def rank_branches(self, latitude: float, longitude: float) -> Optional[List[Dict]]:
+        """Get branches ranked by distance with their delivery zone
+
+        Returns None if branch locations are not configured.
+        """
+        branches = self.get_branch_locations()
+        if branches is None:
+            return None
+        return spatial.branches_by_distance(latitude, longitude, branches, self.get_delivery_zones())
+
+    def get_orders_near(self, latitude: float, longitude: float, radius_km: float,
+                        since_hours: Optional[int] = 24, limit: int = 100) -> List[Dict]:
+        """Get recent orders within radius_km of a point, nearest first"""
+        min_lat, max_lat, min_lon, max_lon = spatial.bounding_box(latitude, longitude, radius_km)
+        query = """
+            SELECT o.* FROM orders_rtree r
+            JOIN orders o ON o.id = r.id
+            WHERE r.max_lat >= ? AND r.min_lat <= ?
+              AND r.max_lon >= ? AND r.min_lon <= ?
+        """
+        params = [min_lat, max_lat, min_lon, max_lon]
+        if since_hours is not None:
+            query += " AND o.created_at >= datetime('now', ?)"
+            params.append(f"-{int(since_hours)} hours")
+        
+        with self.connect() as db:
+            cursor = db.execute(query, params)
+            rows = cursor.fetchall()
+            columns = [description[0] for description in cursor.description]
+        
+        orders = []
+        for row in rows:
+            order = dict(zip(columns, row))
+            distance = spatial.haversine_km(latitude, longitude, order['latitude'], order['longitude'])
+            if distance > radius_km:
+                continue
+            order['items'] = json.loads(order['items'])
+            order['coordinates'] = json.loads(order['coordinates']) if order['coordinates'] else {}
+            order['distance_km'] = round(distance, 3)
+            orders.append(order)
+        
+        orders.sort(key=lambda o: o['distance_km'])
+        return orders[:limit]
+
     def add_contact_message(self, message_data: Dict) -> int:
         """Add a new contact message"""
-        with sqlite3.connect(self.db_path) as db:
+        with self.connect() as db:
             cursor = db.execute("""
                 INSERT INTO contact_messages (customer_name, customer_phone, customer_email, message)
                 VALUES (?, ?, ?, ?)
@@ -194,7 +506,7 @@ class Database:
 
     def get_contact_messages(self, status: Optional[str] = None) -> List[Dict]:
         """Get contact messages by status"""
-        with sqlite3.connect(self.db_path) as db:
+        with self.connect() as db:
             if status:
                 cursor = db.execute("""
                     SELECT * FROM contact_messages WHERE status = ? ORDER BY created_at DESC
@@ -209,9 +521,45 @@ class Database:
             
             return [dict(zip(columns, row)) for row in rows]
 
+    def get_contact_messages_page(self, status: Optional[str] = None, limit: int = 50,
+                                  cursor: Optional[str] = None) -> Dict:
+        """Get one page of contact messages, newest first
+
+        cursor is the 'next_cursor' value returned by the previous page.
+        """
+        limit = max(1, min(int(limit), CONTACT_PAGE_MAX))
+        conditions = []
+        params = []
+        if status:
+            conditions.append("status = ?")
+            params.append(status)
+        if cursor:
+            created_at, _, last_id = cursor.rpartition('|')
+            conditions.append("(created_at, id) < (?, ?)")
+            params.extend([created_at, int(last_id)])
+
+        query = "SELECT * FROM contact_messages"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY created_at DESC, id DESC LIMIT ?"
+        params.append(limit + 1)
+
+        with self.connect() as db:
+            result = db.execute(query, params)
+            rows = result.fetchall()
+            columns = [description[0] for description in result.description]
+
+        messages = [dict(zip(columns, row)) for row in rows[:limit]]
+        next_cursor = None
+        if len(rows) > limit:
+            last = messages[-1]
+            next_cursor = f"{last['created_at']}|{last['id']}"
+
+        return {"messages": messages, "next_cursor": next_cursor}
+
     def update_order_status(self, order_id: str, status: str):
         """Update order status"""
-        with sqlite3.connect(self.db_path) as db:
+        with self.connect() as db:
             db.execute("""
                 UPDATE orders SET status = ?, updated_at = CURRENT_TIMESTAMP
                 WHERE order_id = ?
@@ -220,16 +568,57 @@ class Database:
 
     def update_contact_status(self, message_id: int, status: str):
         """Update contact message status"""
-        with sqlite3.connect(self.db_path) as db:
-            db.execute("""
-                UPDATE contact_messages SET status = ?, updated_at = CURRENT_TIMESTAMP
-                WHERE id = ?
-            """, (status, message_id))
+        self.update_contact_statuses([message_id], status)
+
+    def update_contact_statuses(self, message_ids: List[int], status: str) -> int:
+        """Update status of many contact messages in a single transaction"""
+        ids = list(dict.fromkeys(message_ids))
+        updated = 0
+        with self.connect() as db:
+            for start in range(0, len(ids), CONTACT_BATCH_SIZE):
+                chunk = ids[start:start + CONTACT_BATCH_SIZE]
+                placeholders = ",".join("?" * len(chunk))
+                cursor = db.execute(f"""
+                    UPDATE contact_messages SET status = ?, updated_at = CURRENT_TIMESTAMP
+                    WHERE id IN ({placeholders})
+                """, (status, *chunk))
+                updated += cursor.rowcount
+            db.commit()
+        return updated
+
+    def archive_contact_messages(self, older_than_days: int = 30,
+                                 statuses: tuple = ('resolved',)) -> int:
+        """Move old contact messages with the given statuses to the archive table"""
+        # Same format as CURRENT_TIMESTAMP (UTC); computed once so both
+        # statements below select exactly the same rows
+        now = datetime.now(timezone.utc)
+        cutoff = (now - timedelta(days=int(older_than_days))).strftime('%Y-%m-%d %H:%M:%S')
+        archived_at = now.strftime('%Y-%m-%d %H:%M:%S')
+        placeholders = ",".join("?" * len(statuses))
+        where = f"status IN ({placeholders}) AND updated_at < ?"
+        params = (*statuses, cutoff)
+        with self.connect() as db:
+            # The INSERT takes the write lock, so no other writer can change
+            # contact_messages before the DELETE runs
+            cursor = db.execute(f"""
+                INSERT OR REPLACE INTO contact_messages_archive
+                    (id, customer_name, customer_phone, customer_email, message, status, created_at, updated_at, archived_at)
+                SELECT id, customer_name, customer_phone, customer_email, message, status, created_at, updated_at, ?
+                FROM contact_messages WHERE {where}
+            """, (archived_at, *params))
+            archived = cursor.rowcount
+            cursor = db.execute(f"DELETE FROM contact_messages WHERE {where}", params)
+            if cursor.rowcount != archived:
+                db.rollback()
+                raise sqlite3.DatabaseError(
+                    f"Archived {archived} contact messages but would delete {cursor.rowcount}"
+                )
             db.commit()
+        return archived
 
     def get_admin_setting(self, key: str) -> Optional[str]:
         """Get admin setting by key"""
-        with sqlite3.connect(self.db_path) as db:
+        with self.connect() as db:
             cursor = db.execute("""
                 SELECT value FROM admin_settings WHERE key = ?
             """, (key,))
@@ -238,7 +627,7 @@ class Database:
 
     def set_admin_setting(self, key: str, value: str):
         """Set admin setting"""
-        with sqlite3.connect(self.db_path) as db:
+        with self.connect() as db:
             db.execute("""
                 INSERT OR REPLACE INTO admin_settings (key, value, updated_at)
                 VALUES (?, ?, CURRENT_TIMESTAMP)
@@ -247,7 +636,7 @@ class Database:
 
     def get_categories(self) -> List[Dict]:
         """Get all categories"""
-        with sqlite3.connect(self.db_path) as db:
+        with self.connect() as db:
             cursor = db.execute("""
                 SELECT * FROM categories WHERE is_active = 1 ORDER BY display_order, name
             """)
@@ -264,7 +653,7 @@ class Database:
 
     def add_category(self, category_data: Dict) -> int:
         """Add a new category"""
-        with sqlite3.connect(self.db_path) as db:
+        with self.connect() as db:
             cursor = db.execute("""
                 INSERT INTO categories (name, description, display_order, is_active)
                 VALUES (?, ?, ?, ?)
@@ -279,7 +668,7 @@ class Database:
 
     def update_category(self, category_id: int, category_data: Dict):
         """Update a category"""
-        with sqlite3.connect(self.db_path) as db:
+        with self.connect() as db:
             db.execute("""
                 UPDATE categories SET 
                     name = ?, description = ?, display_order = ?, is_active = ?
@@ -295,7 +684,7 @@ class Database:
 
     def update_product_image(self, product_id: int, image_path: str):
         """Update product image"""
-        with sqlite3.connect(self.db_path) as db:
+        with self.connect() as db:
             db.execute("""
                 UPDATE products SET img = ? WHERE id = ?
             """, (image_path, product_id))
@@ -304,7 +693,7 @@ class Database:
 
     def delete_category(self, category_id: int):
         """Delete a category (soft delete by setting is_active to 0)"""
-        with sqlite3.connect(self.db_path) as db:
+        with self.connect() as db:
             db.execute("""
                 UPDATE categories SET is_active = 0 WHERE id = ?
             """, (category_id,))
@@ -349,7 +738,7 @@ class Database:
         ]
         
         # Clear existing products
-        with sqlite3.connect(self.db_path) as db:
+        with self.connect() as db:
             db.execute("DELETE FROM products")
             db.commit()
         
@@ -371,7 +760,7 @@ class Database:
         ]
         
         # Clear existing categories
-        with sqlite3.connect(self.db_path) as db:
+        with self.connect() as db:
             db.execute("DELETE FROM categories")
             db.commit()
         
@@ -383,52 +772,34 @@ class Database:
 
 # Simple API server for categories and products
 from flask import Flask, jsonify, request
-from flask_cors import CORS
+from cors import init_cors
 import os
 
 app = Flask(__name__)
-CORS(app, origins=['http://127.0.0.1:5500', 'http://localhost:5500', 'http://127.0.0.1:3000', 'http://localhost:3000'])  # Enable CORS for specific origins
+ALLOWED_ORIGINS = ['http://127.0.0.1:5500', 'http://localhost:5500', 'http://127.0.0.1:3000', 'http://localhost:3000']
+init_cors(app, ALLOWED_ORIGINS)  # Enable CORS for specific origins
+init_profiling(app)  # POPAYS_PROFILE=1 bo'lsa
 
 # Initialize database
 db = Database()
 
-@app.route('/api/categories', methods=['GET', 'OPTIONS'])
+@app.route('/api/categories', methods=['GET'])
 def get_categories():
     """API endpoint to get categories"""
-    if request.method == 'OPTIONS':
-        response = jsonify({})
-        response.headers.add('Access-Control-Allow-Origin', '*')
-        response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
-        response.headers.add('Access-Control-Allow-Methods', 'GET,PUT,POST,DELETE,OPTIONS')
-        return response
-    
     try:
         categories = db.get_categories()
         response = jsonify(categories)
-        response.headers.add('Access-Control-Allow-Origin', '*')
-        response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
-        response.headers.add('Access-Control-Allow-Methods', 'GET,PUT,POST,DELETE,OPTIONS')
         return response
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
-@app.route('/api/products', methods=['GET', 'POST', 'OPTIONS'])
+@app.route('/api/products', methods=['GET', 'POST'])
 def products_api():
     """API endpoint to get and add products"""
-    if request.method == 'OPTIONS':
-        response = jsonify({})
-        response.headers.add('Access-Control-Allow-Origin', '*')
-        response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
-        response.headers.add('Access-Control-Allow-Methods', 'GET,PUT,POST,DELETE,OPTIONS')
-        return response
-    
     try:
         if request.method == 'GET':
             products = db.get_products()
             response = jsonify(products)
-            response.headers.add('Access-Control-Allow-Origin', '*')
-            response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
-            response.headers.add('Access-Control-Allow-Methods', 'GET,PUT,POST,DELETE,OPTIONS')
             return response
         
         elif request.method == 'POST':
@@ -448,9 +819,6 @@ def products_api():
                 "message": "Product added successfully",
                 "product_id": product_id
             })
-            response.headers.add('Access-Control-Allow-Origin', '*')
-            response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
-            response.headers.add('Access-Control-Allow-Methods', 'GET,PUT,POST,DELETE,OPTIONS')
             return response
             
     except Exception as e:
@@ -463,7 +831,7 @@ def update_product(product_id):
         data = request.get_json()
         
         # Update product in database
-        with sqlite3.connect(db.db_path) as conn:
+        with db.connect() as conn:
             cursor = conn.execute("""
                 UPDATE products SET 
                     name = ?, price = ?, category = ?, description = ?
@@ -481,9 +849,6 @@ def update_product(product_id):
                 return jsonify({"error": "Product not found"}), 404
         
         response = jsonify({"success": True, "message": "Product updated successfully"})
-        response.headers.add('Access-Control-Allow-Origin', '*')
-        response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
-        response.headers.add('Access-Control-Allow-Methods', 'GET,PUT,POST,DELETE,OPTIONS')
         return response
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -492,7 +857,7 @@ def update_product(product_id):
 def delete_product(product_id):
     """API endpoint to delete product"""
     try:
-        with sqlite3.connect(db.db_path) as conn:
+        with db.connect() as conn:
             cursor = conn.execute("DELETE FROM products WHERE id = ?", (product_id,))
             conn.commit()
             
@@ -500,9 +865,6 @@ def delete_product(product_id):
                 return jsonify({"error": "Product not found"}), 404
         
         response = jsonify({"success": True, "message": "Product deleted successfully"})
-        response.headers.add('Access-Control-Allow-Origin', '*')
-        response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
-        response.headers.add('Access-Control-Allow-Methods', 'GET,PUT,POST,DELETE,OPTIONS')
         return response
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -517,13 +879,56 @@ def update_product_image(product_id):
         db.update_product_image(product_id, image_path)
         
         response = jsonify({"success": True, "message": "Product image updated successfully"})
-        response.headers.add('Access-Control-Allow-Origin', '*')
-        response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
-        response.headers.add('Access-Control-Allow-Methods', 'GET,PUT,POST,DELETE,OPTIONS')
         return response
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/branches/suggest', methods=['GET'])
+def suggest_branch():
+    """API endpoint to suggest the nearest branch and delivery zone"""
+    try:
+        location = spatial.parse_coordinates({
+            'latitude': request.args.get('lat'),
+            'longitude': request.args.get('lon')
+        })
+        if location is None:
+            return jsonify({"error": "Invalid or missing coordinates"}), 400
+
+        ranked = db.rank_branches(*location)
+        if ranked is None:
+            return jsonify({"error": "Branch locations are not configured"}), 503
+
+        suggestion = dict(ranked[0], alternatives=ranked[1:])
+        return jsonify(suggestion)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/orders/nearby', methods=['GET'])
+def orders_nearby():
+    """API endpoint to get recent order locations within a radius of a point"""
+    try:
+        location = spatial.parse_coordinates({
+            'latitude': request.args.get('lat'),
+            'longitude': request.args.get('lon')
+        })
+        if location is None:
+            return jsonify({"error": "Invalid or missing coordinates"}), 400
+
+        radius_km = request.args.get('radius_km', 2.0, type=float)
+        since_hours = request.args.get('hours', 24, type=int)
+        orders = db.get_orders_near(location[0], location[1], radius_km, since_hours)
+
+        # Only locations - no customer details on this unauthenticated endpoint
+        return jsonify([{
+            'id': order['id'],
+            'status': order['status'],
+            'latitude': order['latitude'],
+            'longitude': order['longitude'],
+            'distance_km': order['distance_km']
+        } for order in orders])
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 
 # Database'ni avtomatik to'ldirish
 if __name__ == "__main__":
@@ -531,6 +936,13 @@ if __name__ == "__main__":
     if len(os.sys.argv) > 1 and os.sys.argv[1] == 'server':
         print("Starting API server on http://localhost:5000")
         app.run(debug=True, host='0.0.0.0', port=5000)
+    elif len(os.sys.argv) > 1 and os.sys.argv[1] == 'archive':
+        days = int(os.sys.argv[2]) if len(os.sys.argv) > 2 else 30
+        archived = db.archive_contact_messages(days)
+        print(f"{archived} ta murojaat arxivga ko'chirildi")
+    elif len(os.sys.argv) > 1 and os.sys.argv[1] == 'backfill':
+        updated = db.backfill_order_locations()
+        print(f"{updated} ta buyurtma joylashuvi indekslandi")
     else:
         db.populate_products()
         db.populate_categories()
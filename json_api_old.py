@@ -1,10 +1,13 @@
 import json
 import os
 from flask import Flask, jsonify, request
-from flask_cors import CORS
+from cors import init_cors
+from profiling import init_profiling
 
 app = Flask(__name__)
-CORS(app, origins=['http://127.0.0.1:5500', 'http://localhost:5500', 'http://127.0.0.1:3000', 'http://localhost:3000'])
+ALLOWED_ORIGINS = ['http://127.0.0.1:5500', 'http://localhost:5500', 'http://127.0.0.1:3000', 'http://localhost:3000']
+init_cors(app, ALLOWED_ORIGINS)  # Enable CORS for specific origins
+init_profiling(app)  # POPAYS_PROFILE=1 bo'lsa
 
 # File paths
 CATEGORIES_FILE = 'categories.json'
@@ -42,9 +45,6 @@ def get_categories():
         active_categories.sort(key=lambda x: x.get('display_order', 0))
         
         response = jsonify(active_categories)
-        response.headers.add('Access-Control-Allow-Origin', '*')
-        response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
-        response.headers.add('Access-Control-Allow-Methods', 'GET,PUT,POST,DELETE,OPTIONS')
         return response
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -55,9 +55,6 @@ def get_products():
     try:
         products = load_json_data(PRODUCTS_FILE)
         response = jsonify(products)
-        response.headers.add('Access-Control-Allow-Origin', '*')
-        response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
-        response.headers.add('Access-Control-Allow-Methods', 'GET,PUT,POST,DELETE,OPTIONS')
         return response
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -0,0 +1,201 @@
+import cProfile
+import hmac
+import os
+import pstats
+import random
+import sqlite3
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Dict, List
+
+from flask import g, has_request_context, jsonify, request
+
+# Profiling sozlamalari; init_profiling() ularni muhit o'zgaruvchilaridan o'qiydi:
+# POPAYS_PROFILE=1 - yoqish
+# POPAYS_PROFILE_SAMPLE - so'rovlarning qancha qismi profil qilinadi (0.0 - 1.0)
+# POPAYS_SLOW_MS - sekin so'rov chegarasi (millisekund)
+# POPAYS_SLOW_BUFFER - saqlanadigan sekin so'rovlar soni
+# POPAYS_ADMIN_TOKEN - admin endpoint va X-Profile uchun token (bo'sh bo'lsa profiling yoqilmaydi)
+PROFILE_SAMPLE_RATE = 0.0
+SLOW_REQUEST_MS = 500.0
+SLOW_REQUEST_BUFFER = 100
+ADMIN_TOKEN = ''
+
+PROFILE_HEADER = 'X-Profile'
+PROFILE_TOP_FUNCTIONS = 30
+SQL_PER_REQUEST = 200
+
+_slow_requests = deque(maxlen=SLOW_REQUEST_BUFFER)
+_slow_requests_lock = threading.Lock()
+# Only one cProfile run at a time (on Python 3.12+ profilers are process-wide)
+_profiler_lock = threading.Lock()
+
+
+class TracedConnection(sqlite3.Connection):
+    """SQLite connection that records statement timings for the current request"""
+
+    def execute(self, sql, parameters=()):
+        # sql_statements is only set by the profiling before_request hook
+        statements = g.get('sql_statements') if has_request_context() else None
+        if statements is None:
+            return super().execute(sql, parameters)
+
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            if len(statements) < SQL_PER_REQUEST:
+                statements.append({
+                    'sql': " ".join(sql.split()),
+                    'duration_ms': round((time.perf_counter() - start) * 1000, 3)
+                })
+
+
+def _is_admin() -> bool:
+    """Check the request's bearer token against POPAYS_ADMIN_TOKEN"""
+    if not ADMIN_TOKEN:
+        return False
+    supplied = request.headers.get('Authorization', '')
+    return hmac.compare_digest(supplied.encode(), f"Bearer {ADMIN_TOKEN}".encode())
+
+
+def _should_profile() -> bool:
+    """Decide whether the current request gets a cProfile run"""
+    if request.headers.get(PROFILE_HEADER) == '1' and _is_admin():
+        return True
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+
+def _profile_summary(profiler: cProfile.Profile) -> List[Dict]:
+    """Top functions by cumulative time, with their direct callers"""
+    stats = pstats.Stats(profiler)
+    stats.sort_stats('cumulative')
+    summary = []
+    for func in stats.fcn_list[:PROFILE_TOP_FUNCTIONS]:
+        primitive_calls, total_calls, total_time, cumulative_time, callers = stats.stats[func]
+        summary.append({
+            'function': pstats.func_std_string(func),
+            'calls': total_calls,
+            'total_ms': round(total_time * 1000, 3),
+            'cumulative_ms': round(cumulative_time * 1000, 3),
+            'callers': [pstats.func_std_string(caller) for caller in callers]
+        })
+    return summary
+
+
+def _before_request():
+    g.request_started = time.perf_counter()
+    g.sql_statements = []
+    g.profiler = None
+    # Skip profiling while another request is being profiled
+    if _should_profile() and _profiler_lock.acquire(blocking=False):
+        g.profiler = cProfile.Profile()
+        try:
+            g.profiler.enable()
+        except ValueError:
+            # Another profiling tool is active in this process
+            g.profiler = None
+            _profiler_lock.release()
+
+
+def _after_request(response):
+    started = g.pop('request_started', None)
+    if started is None:
+        return response
+
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        profiler.disable()
+        _profiler_lock.release()
+
+    duration_ms = (time.perf_counter() - started) * 1000
+    if profiler is None and duration_ms < SLOW_REQUEST_MS:
+        return response
+
+    record = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'method': request.method,
+        'path': request.path,
+        'status': response.status_code,
+        'duration_ms': round(duration_ms, 3),
+        'slow': duration_ms >= SLOW_REQUEST_MS,
+        'sql': g.pop('sql_statements', []),
+        'profile': _profile_summary(profiler) if profiler is not None else None
+    }
+    with _slow_requests_lock:
+        _slow_requests.append(record)
+
+    response.headers['Server-Timing'] = f"app;dur={duration_ms:.1f}"
+    return response
+
+
+def get_slow_requests() -> List[Dict]:
+    """Get captured requests, newest first"""
+    with _slow_requests_lock:
+        return list(reversed(_slow_requests))
+
+
+def _teardown_request(exc):
+    # after_request is skipped on unhandled errors; make sure the lock is freed
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        profiler.disable()
+        _profiler_lock.release()
+
+
+def _env_number(app, name: str, cast, default):
+    """Read a numeric setting, falling back to the default on a bad value"""
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    try:
+        return cast(value)
+    except ValueError:
+        app.logger.warning("Invalid %s=%r, using %r", name, value, default)
+        return default
+
+
+def init_profiling(app):
+    """Register profiling hooks and the admin endpoint
+
+    Requires POPAYS_PROFILE=1 and POPAYS_ADMIN_TOKEN; without a token
+    nothing is registered.
+    """
+    global PROFILE_SAMPLE_RATE, SLOW_REQUEST_MS, SLOW_REQUEST_BUFFER, ADMIN_TOKEN, _slow_requests
+
+    if os.environ.get('POPAYS_PROFILE', '0') != '1':
+        return
+    ADMIN_TOKEN = os.environ.get('POPAYS_ADMIN_TOKEN', '')
+    if not ADMIN_TOKEN:
+        app.logger.warning("Profiling disabled: POPAYS_ADMIN_TOKEN is not set")
+        return
+
+    PROFILE_SAMPLE_RATE = _env_number(app, 'POPAYS_PROFILE_SAMPLE', float, 0.0)
+    SLOW_REQUEST_MS = _env_number(app, 'POPAYS_SLOW_MS', float, 500.0)
+    SLOW_REQUEST_BUFFER = max(1, _env_number(app, 'POPAYS_SLOW_BUFFER', int, 100))
+    with _slow_requests_lock:
+        if _slow_requests.maxlen != SLOW_REQUEST_BUFFER:
+            _slow_requests = deque(_slow_requests, maxlen=SLOW_REQUEST_BUFFER)
+
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
+
+    @app.route('/api/admin/slow-requests', methods=['GET', 'DELETE'])
+    def slow_requests():
+        """API endpoint to view or clear captured slow/profiled requests"""
+        if not _is_admin():
+            return jsonify({"error": "Unauthorized"}), 401
+
+        if request.method == 'DELETE':
+            with _slow_requests_lock:
+                _slow_requests.clear()
+            return jsonify({"success": True})
+
+        return jsonify({
+            'threshold_ms': SLOW_REQUEST_MS,
+            'sample_rate': PROFILE_SAMPLE_RATE,
+            'requests': get_slow_requests()
+        })
@@ -0,0 +1,83 @@
+import json
+import math
+from typing import Dict, List, Optional, Tuple
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+def parse_coordinates(value) -> Optional[Tuple[float, float]]:
+    """Decode order coordinates into a (latitude, longitude) tuple
+
+    Accepts a dict or JSON string with latitude/longitude (or lat/lng/lon)
+    keys. Returns None if the value is empty or not a valid location.
+    """
+    if not value:
+        return None
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except ValueError:
+            return None
+    if not isinstance(value, dict):
+        return None
+
+    lat = value.get('latitude', value.get('lat'))
+    lon = value.get('longitude', value.get('lng', value.get('lon')))
+    try:
+        lat, lon = float(lat), float(lon)
+    except (TypeError, ValueError):
+        return None
+
+    if not (-90.0 <= lat <= 90.0 and -180.0 <= lon <= 180.0):
+        return None
+    return lat, lon
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle distance between two points in kilometres"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def bounding_box(lat: float, lon: float, radius_km: float) -> Tuple[float, float, float, float]:
+    """Return (min_lat, max_lat, min_lon, max_lon) enclosing a radius around a point"""
+    dlat = math.degrees(radius_km / EARTH_RADIUS_KM)
+    cos_lat = math.cos(math.radians(lat))
+    if cos_lat < 1e-6:
+        dlon = 180.0
+    else:
+        dlon = min(180.0, math.degrees(radius_km / (EARTH_RADIUS_KM * cos_lat)))
+    return lat - dlat, lat + dlat, lon - dlon, lon + dlon
+
+
+def delivery_zone(distance_km: float, zones: List[Dict]) -> Optional[str]:
+    """Return the delivery zone for a distance from the branch, or None if out of range
+
+    zones is a list of {"name": ..., "max_km": ...} dicts.
+    """
+    for zone in sorted(zones, key=lambda z: z['max_km']):
+        if distance_km <= zone['max_km']:
+            return zone['name']
+    return None
+
+
+def branches_by_distance(lat: float, lon: float, branches: Dict[str, Dict],
+                         zones: List[Dict]) -> List[Dict]:
+    """Get branches sorted by distance from a point
+
+    branches maps a branch key to {"name": ..., "latitude": ..., "longitude": ...}.
+    """
+    ranked = []
+    for key, branch in branches.items():
+        distance = haversine_km(lat, lon, branch['latitude'], branch['longitude'])
+        ranked.append({
+            'branch': key,
+            'name': branch.get('name', key),
+            'distance_km': round(distance, 3),
+            'zone': delivery_zone(distance, zones)
+        })
+    ranked.sort(key=lambda b: b['distance_km'])
+    return ranked
@@ -0,0 +1,15 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """Database on a temporary file"""
+    # database_old creates popays.db in the working directory on import
+    monkeypatch.chdir(tmp_path)
+    from database_old import Database
+    return Database(str(tmp_path / "test.db"))
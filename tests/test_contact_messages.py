@@ -0,0 +1,68 @@
+import sqlite3
+
+
+def add_messages(db, count):
+    return [
+        db.add_contact_message({
+            'customer_name': 'Ali',
+            'customer_phone': '+998901234567',
+            'message': f"Xabar {i}",
+        })
+        for i in range(count)
+    ]
+
+
+def test_cursor_paging_with_equal_created_at(db):
+    ids = add_messages(db, 7)
+    with sqlite3.connect(db.db_path) as conn:
+        conn.execute("UPDATE contact_messages SET created_at = '2025-01-01 10:00:00'")
+
+    seen = []
+    cursor = None
+    while True:
+        page = db.get_contact_messages_page(limit=3, cursor=cursor)
+        seen.extend(message['id'] for message in page['messages'])
+        cursor = page['next_cursor']
+        if cursor is None:
+            break
+
+    assert seen == sorted(ids, reverse=True)
+
+
+def test_paging_filters_by_status(db):
+    ids = add_messages(db, 4)
+    db.update_contact_statuses(ids[:2], 'resolved')
+
+    page = db.get_contact_messages_page(status='resolved')
+
+    assert [message['id'] for message in page['messages']] == sorted(ids[:2], reverse=True)
+    assert page['next_cursor'] is None
+
+
+def test_bulk_update_in_batches(db, monkeypatch):
+    monkeypatch.setattr('database_old.CONTACT_BATCH_SIZE', 2)
+    ids = add_messages(db, 5)
+
+    updated = db.update_contact_statuses(ids + [ids[0]], 'read')
+
+    assert updated == 5
+    assert len(db.get_contact_messages('read')) == 5
+
+
+def test_archive_moves_old_resolved_messages(db):
+    ids = add_messages(db, 6)
+    db.update_contact_statuses(ids[:4], 'resolved')
+    with sqlite3.connect(db.db_path) as conn:
+        conn.execute("""
+            UPDATE contact_messages SET updated_at = datetime('now', '-40 days')
+            WHERE id IN (?, ?, ?, ?, ?)
+        """, ids[:5])
+
+    archived = db.archive_contact_messages(older_than_days=30)
+
+    with sqlite3.connect(db.db_path) as conn:
+        archive_ids = [row[0] for row in conn.execute("SELECT id FROM contact_messages_archive ORDER BY id")]
+    remaining_ids = sorted(message['id'] for message in db.get_contact_messages())
+    assert archived == 4
+    assert archive_ids == ids[:4]
+    assert remaining_ids == ids[4:]
@@ -0,0 +1,113 @@
+import sqlite3
+import threading
+
+ORDER = {
+    'branch': 'kosmonavt',
+    'customer_name': 'Ali',
+    'customer_phone': '+998901234567',
+    'customer_location': "Qo'qon",
+    'items': [{'name': 'Oddiy HotDog', 'quantity': 1}],
+    'total': 8000,
+}
+
+
+def count_orders(db):
+    with sqlite3.connect(db.db_path) as conn:
+        return conn.execute("SELECT COUNT(*) FROM orders").fetchone()[0]
+
+
+def test_retry_with_same_key_returns_original_order(db):
+    first = db.add_order({**ORDER, 'idempotency_key': 'abc'})
+    # Bypass the in-memory cache so the database lookup is used
+    db._idempotency_cache.clear()
+    second = db.add_order({**ORDER, 'idempotency_key': 'abc'})
+
+    assert second == first
+    assert count_orders(db) == 1
+    assert db.get_order_id_for_key('abc') == db.get_orders()[0]['order_id']
+
+
+def test_orders_without_key_are_not_deduplicated(db):
+    db.add_order(ORDER)
+    db.add_order(ORDER)
+    assert count_orders(db) == 2
+
+
+def test_expired_key_creates_new_order(db):
+    first = db.add_order({**ORDER, 'idempotency_key': 'abc'})
+    with sqlite3.connect(db.db_path) as conn:
+        conn.execute("UPDATE order_idempotency_keys SET created_at = datetime('now', '-2 days')")
+    db._idempotency_cache.clear()
+
+    assert db.get_order_id_for_key('abc') is None
+    second = db.add_order({**ORDER, 'idempotency_key': 'abc'})
+
+    assert second != first
+    assert count_orders(db) == 2
+    assert db.get_order_id_for_key('abc') is not None
+
+
+def test_concurrent_retries_insert_one_order(db):
+    barrier = threading.Barrier(8)
+    results = []
+
+    def submit():
+        barrier.wait()
+        results.append(db.add_order({**ORDER, 'idempotency_key': 'race'}))
+
+    threads = [threading.Thread(target=submit) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(set(results)) == 1
+    assert count_orders(db) == 1
+
+
+def test_prune_removes_old_keys(db):
+    db.add_order({**ORDER, 'idempotency_key': 'old'})
+    db.add_order({**ORDER, 'idempotency_key': 'new'})
+    with sqlite3.connect(db.db_path) as conn:
+        conn.execute("""
+            UPDATE order_idempotency_keys SET created_at = datetime('now', '-2 days')
+            WHERE idempotency_key = 'old'
+        """)
+
+    assert db.prune_idempotency_keys() == 1
+    assert db.get_order_id_for_key('new') is not None
+
+
+def set_key_age(db, key, hours):
+    with sqlite3.connect(db.db_path) as conn:
+        conn.execute("""
+            UPDATE order_idempotency_keys SET created_at = datetime('now', ?)
+            WHERE idempotency_key = ?
+        """, (f"-{hours} hours", key))
+
+
+def test_key_found_near_ttl_expires_with_database_row(db):
+    first = db.add_order({**ORDER, 'idempotency_key': 'k'})
+    set_key_age(db, 'k', 23)
+    db._idempotency_cache.clear()
+
+    # Database hit: the cached entry must keep the key's real age
+    assert db.add_order({**ORDER, 'idempotency_key': 'k'}) == first
+
+    set_key_age(db, 'k', 25)
+    # Simulate the remaining hour passing for the cached entry as well
+    row_id, order_id, created_at = db._idempotency_cache['k']
+    db._idempotency_cache['k'] = (row_id, order_id, created_at - 2 * 60 * 60)
+
+    assert db.get_order_id_for_key('k') is None
+    second = db.add_order({**ORDER, 'idempotency_key': 'k'})
+    assert second != first
+    assert count_orders(db) == 2
+
+
+def test_cached_key_returns_original_order_id(db):
+    db.add_order({**ORDER, 'idempotency_key': 'abc'})
+    order_id = db.get_orders()[0]['order_id']
+
+    assert db._idempotency_cache['abc'][1] == order_id
+    assert db.get_order_id_for_key('abc') == order_id
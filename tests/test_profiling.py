@@ -0,0 +1,80 @@
+import pytest
+from flask import Flask, jsonify
+
+import profiling
+
+TOKEN = 's3cret'
+AUTH = {'Authorization': f"Bearer {TOKEN}"}
+
+
+@pytest.fixture
+def client(db, monkeypatch):
+    """Test client for an app with profiling enabled (slow-request capture effectively off)"""
+    monkeypatch.setenv('POPAYS_PROFILE', '1')
+    monkeypatch.setenv('POPAYS_ADMIN_TOKEN', TOKEN)
+    monkeypatch.setenv('POPAYS_PROFILE_SAMPLE', '0')
+    monkeypatch.setenv('POPAYS_SLOW_MS', '100000')
+
+    app = Flask(__name__)
+    profiling.init_profiling(app)
+
+    @app.route('/products')
+    def products():
+        return jsonify(db.get_products())
+
+    @app.route('/boom')
+    def boom():
+        raise RuntimeError("boom")
+
+    client = app.test_client()
+    client.delete('/api/admin/slow-requests', headers=AUTH)
+    return client
+
+
+def captured(client):
+    return client.get('/api/admin/slow-requests', headers=AUTH).get_json()['requests']
+
+
+def test_profile_header_without_token_is_ignored(client):
+    client.get('/products', headers={'X-Profile': '1'})
+    assert captured(client) == []
+
+
+def test_profile_header_with_token_captures_sql_and_profile(client):
+    client.get('/products', headers={'X-Profile': '1', **AUTH})
+
+    requests = [r for r in captured(client) if r['path'] == '/products']
+    assert len(requests) == 1
+    assert requests[0]['sql'][0]['sql'] == 'SELECT * FROM products ORDER BY id'
+    assert requests[0]['profile']
+
+
+def test_admin_endpoint_requires_token(client):
+    assert client.get('/api/admin/slow-requests').status_code == 401
+    assert client.delete('/api/admin/slow-requests',
+                         headers={'Authorization': 'Bearer wrong'}).status_code == 401
+
+
+def test_profiler_lock_released_when_view_raises(client):
+    response = client.get('/boom', headers={'X-Profile': '1', **AUTH})
+
+    assert response.status_code == 500
+    assert not profiling._profiler_lock.locked()
+
+
+def test_no_token_registers_nothing(monkeypatch):
+    monkeypatch.setenv('POPAYS_PROFILE', '1')
+    monkeypatch.delenv('POPAYS_ADMIN_TOKEN', raising=False)
+    app = Flask(__name__)
+    profiling.init_profiling(app)
+
+    assert app.test_client().get('/api/admin/slow-requests').status_code == 404
+
+
+def test_bad_numeric_setting_falls_back_to_default(monkeypatch):
+    monkeypatch.setenv('POPAYS_PROFILE', '1')
+    monkeypatch.setenv('POPAYS_ADMIN_TOKEN', TOKEN)
+    monkeypatch.setenv('POPAYS_PROFILE_SAMPLE', 'often')
+    profiling.init_profiling(Flask(__name__))
+
+    assert profiling.PROFILE_SAMPLE_RATE == 0.0
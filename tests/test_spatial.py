@@ -0,0 +1,102 @@
+import json
+import math
+import sqlite3
+
+import pytest
+
+import spatial
+
+ORDER = {
+    'branch': 'kosmonavt',
+    'customer_name': 'Ali',
+    'customer_phone': '+998901234567',
+    'customer_location': "Qo'qon",
+    'items': [{'name': 'Oddiy HotDog', 'quantity': 1}],
+    'total': 8000,
+}
+
+CENTER = (40.53, 70.94)
+
+
+@pytest.mark.parametrize('value, expected', [
+    ({'latitude': 40.5, 'longitude': 70.9, 'accuracy': 10}, (40.5, 70.9)),
+    ({'lat': '40.5', 'lng': '70.9'}, (40.5, 70.9)),
+    ('{"latitude": 40.5, "longitude": 70.9}', (40.5, 70.9)),
+    ({'latitude': 91, 'longitude': 70.9}, None),
+    ({'latitude': 40.5, 'longitude': -181}, None),
+    ({'latitude': float('nan'), 'longitude': 70.9}, None),
+    ('{"latitude": NaN, "longitude": 70.9}', None),
+    ({}, None),
+    ('not json', None),
+    (None, None),
+])
+def test_parse_coordinates(value, expected):
+    assert spatial.parse_coordinates(value) == expected
+
+
+def add_order_at(db, lat, lon):
+    return db.add_order({**ORDER, 'coordinates': {'latitude': lat, 'longitude': lon}})
+
+
+def test_radius_query_drops_bounding_box_corners(db):
+    min_lat, max_lat, min_lon, max_lon = spatial.bounding_box(*CENTER, 1.0)
+    inside = add_order_at(db, CENTER[0] + 0.001, CENTER[1])
+    # Inside the bounding box, but about 1.27 km away
+    corner_lat = CENTER[0] + (max_lat - CENTER[0]) * 0.9
+    corner_lon = CENTER[1] + (max_lon - CENTER[1]) * 0.9
+    assert spatial.haversine_km(*CENTER, corner_lat, corner_lon) > 1.0
+    add_order_at(db, corner_lat, corner_lon)
+    add_order_at(db, CENTER[0] + 1, CENTER[1])
+
+    orders = db.get_orders_near(*CENTER, radius_km=1.0)
+
+    assert [order['id'] for order in orders] == [inside]
+
+
+def test_radius_query_since_hours(db):
+    recent = add_order_at(db, *CENTER)
+    old = add_order_at(db, *CENTER)
+    with sqlite3.connect(db.db_path) as conn:
+        conn.execute("UPDATE orders SET created_at = datetime('now', '-48 hours') WHERE id = ?", (old,))
+
+    assert [o['id'] for o in db.get_orders_near(*CENTER, radius_km=1.0, since_hours=24)] == [recent]
+    assert len(db.get_orders_near(*CENTER, radius_km=1.0, since_hours=None)) == 2
+
+
+def test_rank_branches_needs_configuration(db):
+    assert db.rank_branches(*CENTER) is None
+
+
+def test_rank_branches_with_zones(db):
+    db.set_admin_setting('branch_locations', json.dumps({
+        'kosmonavt': {'name': 'Kosmonavt', 'latitude': CENTER[0], 'longitude': CENTER[1]},
+        'derizli': {'name': 'Derizli', 'latitude': CENTER[0] + 0.05, 'longitude': CENTER[1]},
+    }))
+    db.set_admin_setting('delivery_zones', json.dumps([
+        {'name': 'shahar', 'max_km': 7},
+        {'name': 'yaqin', 'max_km': 3},
+    ]))
+
+    ranked = db.rank_branches(CENTER[0] + 0.01, CENTER[1])
+
+    assert [b['branch'] for b in ranked] == ['kosmonavt', 'derizli']
+    assert ranked[0]['zone'] == 'yaqin'
+    assert ranked[1]['zone'] == 'shahar'
+    assert math.isclose(ranked[0]['distance_km'], 1.112, abs_tol=0.01)
+
+
+def test_backfill_indexes_old_orders_once(db):
+    with sqlite3.connect(db.db_path) as conn:
+        for coordinates in ('{"latitude": 40.53, "longitude": 70.94}', '{}', '{"latitude": "x"}'):
+            conn.execute("""
+                INSERT INTO orders (order_id, branch, customer_name, customer_phone,
+                                    customer_location, items, total, coordinates)
+                VALUES (?, 'kosmonavt', 'Ali', '1', 'x', '[]', 1, ?)
+            """, (coordinates, coordinates))
+
+    assert db.get_orders_near(*CENTER, radius_km=1.0) == []
+    assert db.backfill_order_locations() == 1
+    assert len(db.get_orders_near(*CENTER, radius_km=1.0)) == 1
+    # Unparseable rows are not rescanned
+    assert db.backfill_order_locations() == 0
+    assert db.get_admin_setting('order_locations_backfilled_id') == '3'